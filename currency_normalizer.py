@@ -0,0 +1,248 @@
+import sys
+import pandas as pd
+import logging
+from pathlib import Path
+
+
+class CurrencyNormalizer:
+    """Convertit tous les historiques de prix dans une devise de reporting unique.
+
+    Les taux de change viennent d'une table locale datee (data/fx_rates.csv,
+    lignes # ignorees) au format: date,currency,rate ou rate = unites de devise
+    pour 1 USD (ex: 2026-07-01,CNY,7.15), a remplir avec des taux officiels. Chaque prix utilise le dernier taux connu a sa
+    date (recherche as-of vectorisee), a condition qu'il ait moins de
+    max_rate_age: une table qui n'est plus mise a jour fait echouer la
+    normalisation au lieu de reutiliser indefiniment le dernier taux. Les lignes RMB/USD d'un meme item sont
+    fusionnees en une seule serie qui garde les deux prix publies.
+
+    Une serie peut changer de base (price_basis) dans le temps: si la cotation
+    dans la devise de reporting disparait, la serie continue avec la cotation
+    convertie de l'autre devise (ex: prix export USD puis prix domestique RMB),
+    ce qui peut creer un saut sans lien avec le marche. Chaque changement de
+    base est signale dans le log.
+    """
+
+    # Devise par defaut des items publies sans mention de devise
+    default_currencies = {
+        'infolink': 'CNY',
+        'energytrend': 'CNY',
+        'pvinsights': 'USD',
+    }
+    # Noms utilises par les sources -> codes ISO de la table de change
+    currency_aliases = {'RMB': 'CNY'}
+    currency_pattern = r'\((USD|RMB|EUR)\b'
+    key_columns = ['date', 'source', 'category', 'series']
+    # Age maximum d'un taux de change utilisable pour convertir un prix
+    max_rate_age = pd.Timedelta(days=45)
+
+    def __init__(self, reporting_currency='USD'):
+        self.reporting_currency = reporting_currency
+        self.data_dir = Path('data')
+        self.processed_dir = self.data_dir / 'processed'
+        self.fx_file = self.data_dir / 'fx_rates.csv'
+        self.output_file = self.processed_dir / 'normalized_prices.csv'
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(self.data_dir / 'currency_normalizer.log', encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def load_fx_rates(self):
+        try:
+            fx = pd.read_csv(self.fx_file, comment='#', dtype={'currency': str})
+            fx['date'] = pd.to_datetime(fx['date']).astype('datetime64[ns]')
+            fx['currency'] = fx['currency'].astype(str).str.strip().str.upper()
+            fx['rate'] = pd.to_numeric(fx['rate'], errors='coerce')
+            # Le USD est la devise pivot de la table: son taux vaut toujours 1
+            fx = fx.dropna(subset=['rate'])
+            fx = fx[fx['currency'] != 'USD']
+            fx = fx.sort_values('date').reset_index(drop=True)
+            if fx.empty:
+                self.logger.error(f"Aucun taux de change dans {self.fx_file}")
+                return None
+            self.logger.info(f"Taux de change charges: {len(fx)} lignes, devises {sorted(fx['currency'].unique())}")
+            return fx
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture des taux de change ({self.fx_file}): {str(e)}")
+            return None
+
+    def load_prices(self):
+        try:
+            frames = []
+            for source in self.default_currencies:
+                historical_file = self.processed_dir / f'historical_{source}_prices.csv'
+                if not historical_file.exists():
+                    self.logger.info(f"Pas d'historique pour {source}, ignore")
+                    continue
+                df = pd.read_csv(historical_file)
+                # Les premieres lignes de l'historique n'ont pas de colonne source remplie
+                df['source'] = source
+                self.logger.info(f"Historique {source}: {len(df)} entrees")
+                frames.append(df)
+
+            if not frames:
+                self.logger.error("Aucun historique de prix a normaliser")
+                return None
+            return pd.concat(frames, ignore_index=True)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la lecture des historiques: {str(e)}")
+            return None
+
+    def to_long(self, df):
+        """Une ligne par (item, date, devise cotee), avec le nom de serie sans devise."""
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+        for col in ['high', 'low', 'avg', 'avg_cny']:
+            if col in df.columns:
+                # Les valeurs verrouillees (🔒, --) deviennent NaN
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        item_name = df['item_name'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+        currency = item_name.str.extract(self.currency_pattern, expand=False)
+        currency = currency.replace(self.currency_aliases)
+        df['currency'] = currency.fillna(df['source'].map(self.default_currencies))
+
+        # "(USD)" disparait, "(USD, FOB)" devient "(FOB)"; "(USD)(Germany" et
+        # "(USD) (Germany" donnent tous deux " (Germany" apres normalisation des espaces
+        series = item_name.str.replace(r'\s*\((?:USD|RMB|EUR)\)\s*', ' ', regex=True)
+        series = series.str.replace(r'\((?:USD|RMB|EUR),\s*', '(', regex=True)
+        df['series'] = series.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+        columns = self.key_columns + ['currency', 'high', 'low', 'avg']
+        long_df = df[columns]
+
+        # PVInsights publie un prix moyen CNY en parallele du prix USD
+        if 'avg_cny' in df.columns:
+            cny = df.loc[df['avg_cny'].notna(), self.key_columns + ['avg_cny']]
+            cny = cny.rename(columns={'avg_cny': 'avg'}).assign(currency='CNY')
+            long_df = pd.concat([long_df, cny.reindex(columns=columns)], ignore_index=True)
+
+        return long_df.dropna(subset=['avg']).reset_index(drop=True)
+
+    def convert(self, long_df, fx):
+        """Ajoute les prix convertis dans la devise de reporting (as-of vectorise)."""
+        long_df = long_df.sort_values('date').reset_index(drop=True)
+        quoted = pd.merge_asof(
+            long_df, fx.rename(columns={'currency': 'fx_currency', 'rate': 'quoted_rate'}),
+            on='date', left_by='currency', right_by='fx_currency',
+            direction='backward', tolerance=self.max_rate_age
+        )
+        quoted.loc[quoted['currency'] == 'USD', 'quoted_rate'] = 1.0
+
+        reporting_fx = fx[fx['currency'] == self.reporting_currency][['date', 'rate']]
+        converted = pd.merge_asof(
+            quoted, reporting_fx.rename(columns={'rate': 'reporting_rate'}),
+            on='date', direction='backward', tolerance=self.max_rate_age
+        )
+        if self.reporting_currency == 'USD':
+            converted['reporting_rate'] = 1.0
+
+        factor = converted['reporting_rate'] / converted['quoted_rate']
+        for col in ['high', 'low', 'avg']:
+            converted[f'{col}_converted'] = converted[col] * factor
+        converted['fx_rate'] = factor
+        return converted.drop(columns=['fx_currency', 'quoted_rate', 'reporting_rate'])
+
+    def collapse(self, converted):
+        """Fusionne les lignes multi-devises d'un meme item en une seule serie."""
+        # Priorite a la cotation native dans la devise de reporting; a devise egale,
+        # la ligne la plus complete. Les lignes avg_cny de PVInsights n'ont ni high
+        # ni low: si elles sont retenues (reporting CNY), high/low restent vides
+        # plutot que d'etre repris d'une autre cotation
+        converted = converted.assign(
+            _native=(converted['currency'] != self.reporting_currency).astype(int),
+            _incomplete=converted['high'].isna().astype(int),
+        )
+        chosen = converted.sort_values(self.key_columns + ['_native', '_incomplete', 'currency'])
+        chosen = chosen.drop_duplicates(subset=self.key_columns, keep='first')
+        chosen = chosen.assign(
+            currency=self.reporting_currency,
+            price_basis=chosen['_native'].map({0: 'quoted', 1: 'converted'}),
+            quoted_currency=chosen['currency'],
+            high=chosen['high_converted'],
+            low=chosen['low_converted'],
+            avg=chosen['avg_converted'],
+        )
+
+        # Conserver chaque prix moyen publie, une colonne par devise cotee
+        quoted_avgs = converted.groupby(self.key_columns + ['currency'])['avg'].last().unstack('currency')
+        quoted_avgs.columns = [f'avg_{c.lower()}_quoted' for c in quoted_avgs.columns]
+
+        result = chosen[self.key_columns + ['currency', 'high', 'low', 'avg',
+                                            'price_basis', 'quoted_currency', 'fx_rate']]
+        result = result.merge(quoted_avgs.reset_index(), on=self.key_columns, how='left')
+        return result.sort_values(self.key_columns).reset_index(drop=True)
+
+    def log_basis_changes(self, normalized):
+        series_columns = ['source', 'category', 'series']
+        ordered = normalized.sort_values(series_columns + ['date'])
+        previous = ordered.groupby(series_columns)['quoted_currency'].shift()
+        changes = ordered[previous.notna() & (previous != ordered['quoted_currency'])]
+        for _, row in changes.iterrows():
+            previous_currency = previous.loc[row.name]
+            self.logger.warning(
+                f"Changement de base pour {row['source']} / {row['series']} le {row['date']:%Y-%m-%d}: "
+                f"cotation {previous_currency} -> {row['quoted_currency']} ({row['price_basis']})"
+            )
+
+    def normalize(self, prices, fx):
+        long_df = self.to_long(prices)
+        self.logger.info(f"Prix cotes apres mise a plat: {len(long_df)}")
+        converted = self.convert(long_df, fx)
+
+        # Un prix sans taux de change donnerait une serie vide: on n'ecrit rien
+        missing = converted[converted['fx_rate'].isna()]
+        if not missing.empty:
+            for currency, group in missing.groupby('currency'):
+                self.logger.error(
+                    f"{len(group)} prix {currency} sans taux de change de moins de "
+                    f"{self.max_rate_age.days} jours (premiere date: {group['date'].min():%Y-%m-%d})"
+                )
+            return None
+
+        normalized = self.collapse(converted)
+        self.log_basis_changes(normalized)
+        normalized['date'] = normalized['date'].dt.strftime('%Y-%m-%d')
+        self.logger.info(f"Series normalisees: {len(normalized)} lignes en {self.reporting_currency}")
+        return normalized
+
+    def run(self):
+        self.logger.info(f"Debut de la normalisation des prix en {self.reporting_currency}")
+        fx = self.load_fx_rates()
+        if fx is None:
+            return False
+        if self.reporting_currency != 'USD' and self.reporting_currency not in set(fx['currency']):
+            self.logger.error(f"Devise de reporting absente de la table de change: {self.reporting_currency}")
+            return False
+
+        prices = self.load_prices()
+        if prices is None:
+            return False
+
+        try:
+            normalized = self.normalize(prices, fx)
+            if normalized is None:
+                self.logger.error(f"Table de change incomplete ({self.fx_file}), normalisation annulee")
+                return False
+            normalized.to_csv(self.output_file, index=False)
+            self.logger.info(f"Prix normalises sauvegardes dans {self.output_file}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la normalisation: {str(e)}")
+            self.logger.exception("Detail de l'erreur:")
+            return False
+
+
+if __name__ == "__main__":
+    reporting_currency = sys.argv[1].upper() if len(sys.argv) > 1 else 'USD'
+    normalizer = CurrencyNormalizer(reporting_currency)
+    if not normalizer.run():
+        sys.exit(1)
@@ -0,0 +1,255 @@
+import sys
+import re
+import json
+import html
+import hashlib
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+from pathlib import Path
+
+# A incrementer quand le rendu change, pour forcer la regeneration de toutes les series
+RENDER_VERSION = 1
+
+
+def render_series(series):
+    """Genere le graphique PNG et le tableau HTML d'une serie (execute dans un process du pool)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    df = pd.DataFrame(series['records'])
+    df['date'] = pd.to_datetime(df['date'])
+    report_dir = Path(series['report_dir'])
+
+    fig, ax = plt.subplots(figsize=(9, 4))
+    for col in series['plot_columns']:
+        if df[col].notna().any():
+            ax.plot(df['date'], df[col], marker='o', markersize=3, label=col)
+    ax.set_title(series['title'], fontsize=10)
+    ax.set_ylabel(series['unit'])
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=8)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    fig.savefig(report_dir / series['chart'], dpi=100)
+    plt.close(fig)
+
+    table = df.sort_values('date', ascending=False)
+    table['date'] = table['date'].dt.strftime('%Y-%m-%d')
+    (report_dir / series['table']).write_text(
+        table.to_html(index=False, na_rep='', border=0), encoding='utf-8'
+    )
+    return series['id']
+
+
+class ReportBuilder:
+    """Rapport statique (graphiques + tableaux) regenere uniquement pour les series modifiees.
+
+    Chaque serie est hashee a partir de ses donnees d'entree; le manifest du
+    rapport garde ces hashes pour ne re-rendre que les series qui ont change.
+    """
+
+    price_sources = ['infolink', 'energytrend', 'pvinsights']
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.data_dir = Path('data')
+        self.processed_dir = self.data_dir / 'processed'
+        self.archives_dir = self.data_dir / 'archives' / 'processed'
+        self.report_dir = Path('report')
+        self.charts_dir = self.report_dir / 'charts'
+        self.tables_dir = self.report_dir / 'tables'
+        self.manifest_file = self.report_dir / 'manifest.json'
+        self.charts_dir.mkdir(parents=True, exist_ok=True)
+        self.tables_dir.mkdir(parents=True, exist_ok=True)
+        self.setup_logging()
+
+    def setup_logging(self):
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(self.data_dir / 'report_builder.log', encoding='utf-8'),
+                logging.StreamHandler()
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def slugify(text):
+        slug = re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:60]
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]
+        return f'{slug}-{digest}'
+
+    @staticmethod
+    def hash_frame(df, title):
+        digest = hashlib.sha256(f'{RENDER_VERSION}|{title}'.encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        digest.update(','.join(df.columns).encode('utf-8'))
+        return digest.hexdigest()
+
+    def make_series(self, group, title, section, unit, columns, plot_columns):
+        frame = group[['date'] + columns].sort_values('date').reset_index(drop=True)
+        series_id = self.slugify(f'{section}|{title}')
+        return {
+            'id': series_id,
+            'title': title,
+            'section': section,
+            'unit': unit,
+            'plot_columns': plot_columns,
+            'hash': self.hash_frame(frame, title),
+            'rows': len(frame),
+            'last_date': frame['date'].iloc[-1],
+            'chart': f'charts/{series_id}.png',
+            'table': f'tables/{series_id}.html',
+            'records': frame.to_dict('records'),
+            'report_dir': str(self.report_dir),
+        }
+
+    def load_price_series(self):
+        series = []
+        for source in self.price_sources:
+            historical_file = self.processed_dir / f'historical_{source}_prices.csv'
+            if not historical_file.exists():
+                self.logger.info(f"Pas d'historique pour {source}, ignore")
+                continue
+
+            df = pd.read_csv(historical_file)
+            for col in ['high', 'low', 'avg']:
+                # Les valeurs verrouillees (🔒, --) deviennent NaN
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            df['item_name'] = df['item_name'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+            df = df.drop_duplicates(subset=['date', 'category', 'item_name'], keep='last')
+
+            for (category, item_name), group in df.groupby(['category', 'item_name'], sort=True):
+                if group['avg'].isna().all():
+                    continue
+                series.append(self.make_series(
+                    group, f'{category} - {item_name}', source, 'Prix',
+                    ['high', 'low', 'avg'], ['high', 'low', 'avg']
+                ))
+            self.logger.info(f"Historique {source}: {len(df)} entrees")
+        return series
+
+    def load_freight_series(self):
+        # L'historique de fret courant est dans processed, l'ancien dans les archives
+        for freight_file in [self.processed_dir / 'historical_freight_rates.csv',
+                             self.archives_dir / 'historical_freight_rates.csv']:
+            if freight_file.exists():
+                break
+        else:
+            self.logger.info("Pas d'historique de fret, ignore")
+            return []
+
+        df = pd.read_csv(freight_file)
+        df = df.drop_duplicates(subset=['date', 'route', 'container_type'], keep='last')
+        self.logger.info(f"Historique fret ({freight_file}): {len(df)} entrees")
+
+        columns = ['price_min_usd', 'price_max_usd', 'transit_min_days', 'transit_max_days']
+        series = []
+        for (route, container_type), group in df.groupby(['route', 'container_type'], sort=True):
+            series.append(self.make_series(
+                group, f'{route} - {container_type}', 'freight', 'USD',
+                columns, ['price_min_usd', 'price_max_usd']
+            ))
+        return series
+
+    def load_manifest(self):
+        if not self.manifest_file.exists():
+            return {'series': {}}
+        try:
+            return json.loads(self.manifest_file.read_text(encoding='utf-8'))
+        except Exception as e:
+            self.logger.error(f"Manifest illisible, regeneration complete: {str(e)}")
+            return {'series': {}}
+
+    def is_up_to_date(self, series, previous):
+        entry = previous.get(series['id'])
+        return (entry is not None
+                and entry['hash'] == series['hash']
+                and (self.report_dir / entry['chart']).exists()
+                and (self.report_dir / entry['table']).exists())
+
+    def render(self, series_list):
+        if not series_list:
+            return
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for series_id in executor.map(render_series, series_list):
+                self.logger.info(f"  Rendu: {series_id}")
+
+    def remove_stale(self, previous, current_ids):
+        for series_id, entry in previous.items():
+            if series_id in current_ids:
+                continue
+            for key in ['chart', 'table']:
+                (self.report_dir / entry[key]).unlink(missing_ok=True)
+            self.logger.info(f"  Supprime (serie disparue): {series_id}")
+
+    def write_index(self, entries):
+        sections = {}
+        for entry in entries.values():
+            sections.setdefault(entry['section'], []).append(entry)
+
+        lines = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+                 '<title>Solar price tracker</title></head><body>',
+                 '<h1>Solar price tracker</h1>']
+        for section in sorted(sections):
+            lines.append(f'<h2>{html.escape(section)}</h2>')
+            for entry in sorted(sections[section], key=lambda e: e['title']):
+                title = html.escape(entry['title'])
+                lines.append(
+                    f'<h3>{title}</h3>'
+                    f'<p>Derniere donnee: {entry["last_date"]} '
+                    f'(<a href="{entry["table"]}">tableau</a>)</p>'
+                    f'<img src="{entry["chart"]}" alt="{title}">'
+                )
+        lines.append('</body></html>')
+        (self.report_dir / 'index.html').write_text('\n'.join(lines), encoding='utf-8')
+
+    def build(self):
+        series_list = self.load_price_series() + self.load_freight_series()
+        previous = self.load_manifest()['series']
+
+        changed = [s for s in series_list if not self.is_up_to_date(s, previous)]
+        current_ids = {s['id'] for s in series_list}
+        stale = set(previous) - current_ids
+        self.logger.info(f"Series: {len(series_list)}, a regenerer: {len(changed)}, supprimees: {len(stale)}")
+
+        if not changed and not stale and (self.report_dir / 'index.html').exists():
+            self.logger.info("Aucune donnee nouvelle, rapport deja a jour")
+            return True
+
+        self.render(changed)
+        self.remove_stale(previous, current_ids)
+
+        keys = ['title', 'section', 'hash', 'rows', 'last_date', 'chart', 'table']
+        entries = {s['id']: {k: s[k] for k in keys} for s in series_list}
+        self.write_index(entries)
+        manifest = {
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'render_version': RENDER_VERSION,
+            'series': entries,
+        }
+        self.manifest_file.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.logger.info(f"Manifest sauvegarde dans {self.manifest_file}")
+        return True
+
+    def run(self):
+        self.logger.info("Debut de la generation du rapport")
+        try:
+            success = self.build()
+            if success:
+                self.logger.info("Generation du rapport terminee avec succes")
+            return success
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la generation du rapport: {str(e)}")
+            self.logger.exception("Detail de l'erreur:")
+            return False
+
+
+if __name__ == "__main__":
+    builder = ReportBuilder()
+    if not builder.run():
+        sys.exit(1)